@@ -1,9 +1,11 @@
-from typing import List, Dict, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Dict, Optional, Tuple
 import numpy as np
 from sympy import S
-from sympy.physics.wigner import wigner_3j
+from sympy.physics.wigner import wigner_3j, wigner_6j
 from .ion import Ion
-from .laser import Laser
+from .laser import Laser, Polarization
 from .energy_level import (
     EnergyLevel,
     FineStructureZeemanLevel,
@@ -13,7 +15,7 @@ from .energy_level import (
 )
 from enum import Enum
 from .units import Constants, Units
-from .utils import number_to_sympy, sympy_to_number
+from .utils import get_resonant_frequency, number_to_sympy, sympy_to_number
 
 
 class TransitionOrder(Enum):
@@ -21,6 +23,66 @@ class TransitionOrder(Enum):
     quadrupole = 1
 
 
+@lru_cache(maxsize=None)
+def get_quadrupole_angular_table(
+    J_upper: float,
+    J_lower: float,
+    I: Optional[float] = None,
+    F_upper: Optional[float] = None,
+    F_lower: Optional[float] = None,
+) -> np.ndarray:
+    """Return <upper m_upper|T^2_q|lower m_lower> / <J_upper||T^2||J_lower> with
+    q = m_upper - m_lower for every Zeeman pair of a quadrupole transition.
+
+    Without F the levels are fine structure levels and the table is indexed by
+    [m_J_upper + J_upper, m_J_lower + J_lower]. With I, F_upper and F_lower the
+    levels are hyperfine levels, the reduced matrix element is decoupled with a
+    6j symbol and the table is indexed by [m_F_upper + F_upper, m_F_lower + F_lower].
+    """
+    if F_upper is None:
+        j_upper, j_lower = J_upper, J_lower
+        reduced_factor = 1.0
+    else:
+        j_upper, j_lower = F_upper, F_lower
+        reduced_factor = (
+            (-1) ** int(round(J_upper + I + F_lower + 2))
+            * np.sqrt((2 * F_upper + 1) * (2 * F_lower + 1))
+            * sympy_to_number(
+                wigner_6j(
+                    number_to_sympy(J_upper),
+                    number_to_sympy(F_upper),
+                    number_to_sympy(I),
+                    number_to_sympy(F_lower),
+                    number_to_sympy(J_lower),
+                    number_to_sympy(2),
+                )
+            )
+        )
+    m_upper_values = np.arange(-j_upper, j_upper + 1)
+    m_lower_values = np.arange(-j_lower, j_lower + 1)
+    table = np.zeros((len(m_upper_values), len(m_lower_values)))
+    for i, m_upper in enumerate(m_upper_values):
+        for j, m_lower in enumerate(m_lower_values):
+            if reduced_factor == 0 or abs(m_upper - m_lower) > 2:
+                continue
+            table[i, j] = (
+                reduced_factor
+                * (-1) ** int(round(j_upper - m_upper))
+                * sympy_to_number(
+                    wigner_3j(
+                        number_to_sympy(j_upper),
+                        number_to_sympy(2),
+                        number_to_sympy(j_lower),
+                        -number_to_sympy(m_upper),
+                        number_to_sympy(m_upper - m_lower),
+                        number_to_sympy(m_lower),
+                    )
+                )
+            )
+    table.flags.writeable = False
+    return table
+
+
 class Transition:
     def __init__(
         self,
@@ -28,15 +90,23 @@ class Transition:
         level_2: EnergyLevel,
         laser: Laser,
         magnetic_field: float,
+        energies: Optional[Dict[EnergyLevel, float]] = None,
     ):
+        """
+        energies maps levels to their energies in the magnetic field, as computed by
+        Experiment. Levels missing from it use their own energy attribute.
+        """
         self.laser = laser
         self.magnetic_field = magnetic_field
-        if level_1.energy > level_2.energy:
-            self.lower_level = level_2
-            self.upper_level = level_1
+        energies = energies or {}
+        energy_1 = energies.get(level_1, level_1.energy)
+        energy_2 = energies.get(level_2, level_2.energy)
+        if energy_1 > energy_2:
+            self.lower_level, self.lower_energy = level_2, energy_2
+            self.upper_level, self.upper_energy = level_1, energy_1
         else:
-            self.lower_level = level_1
-            self.upper_level = level_2
+            self.lower_level, self.lower_energy = level_1, energy_1
+            self.upper_level, self.upper_energy = level_2, energy_2
         self.transition_order = self.get_transition_order()
         self.transition_linewidth = (
             self.upper_level.line_width
@@ -50,7 +120,7 @@ class Transition:
         return self.upper_level.branching_ratios[self.lower_level.name]
 
     def get_transition_energy(self):
-        return self.level1.energy - self.level2.energy
+        return self.upper_energy - self.lower_energy
 
     def get_transition_order(self):
         if abs(self.lower_level.L - self.upper_level.L) == 1:
@@ -61,7 +131,11 @@ class Transition:
             raise ValueError("Transition order not supported")
 
     def __str__(self):
-        return f"Transition(level_1={self.lower_level}, level_2={self.upper_level})"
+        return (
+            f"Transition(level_1={self.lower_level}, level_2={self.upper_level}, "
+            f"lower_energy={self.lower_energy/Constants.h/Units.THz} THz, "
+            f"upper_energy={self.upper_energy/Constants.h/Units.THz} THz)"
+        )
 
     def __repr__(self):
         return self.__str__()
@@ -87,11 +161,11 @@ class Transition:
                 + max(self.lower_level.J, self.upper_level.J)
                 - self.upper_level.m
             )
+            # epsilon . d = sum_q (-1)^q epsilon_{-q} d_q, d_q drives m_upper - m_lower = q
+            epsilon = self.laser.polarization.epsilon_in_spherical_tensor
             polarization_effect = 0j
-            for q, eps_q in zip(
-                range(-1, 2), self.laser.polarization.epsilon_in_spherical_tensor
-            ):
-                polarization_effect += eps_q * sympy_to_number(
+            for q in range(-1, 2):
+                polarization_effect += (-1) ** q * epsilon[1 - q] * sympy_to_number(
                     wigner_3j(
                         number_to_sympy(self.upper_level.J),
                         number_to_sympy(1),
@@ -103,20 +177,88 @@ class Transition:
                 )
             return sign * coefficient * polarization_effect
         elif self.transition_order == TransitionOrder.quadrupole:
-            raise NotImplementedError("Quadrupole transitions not implemented")
+            coefficient = (
+                self.laser.get_electric_field_amplitude()
+                / Constants.h_bar
+                * np.sqrt(
+                    5
+                    * Constants.epsilon_0
+                    * Constants.h_bar
+                    * self.laser.wavelength**3
+                    * self.transition_branching_ratio
+                    * self.transition_linewidth
+                    / (4 * np.pi**2)
+                )
+            ) * np.sqrt(2 * self.upper_level.J + 1)
+            q = int(round(self.upper_level.m - self.lower_level.m))
+            if abs(q) > 2:
+                return 0j
+            upper_hyperfine = isinstance(self.upper_level, HyperfineStructureZeemanLevel)
+            lower_hyperfine = isinstance(self.lower_level, HyperfineStructureZeemanLevel)
+            if upper_hyperfine != lower_hyperfine:
+                raise ValueError(
+                    "Quadrupole transitions between fine and hyperfine structure levels are not supported"
+                )
+            if upper_hyperfine:
+                angular_table = get_quadrupole_angular_table(
+                    float(self.upper_level.J),
+                    float(self.lower_level.J),
+                    float(self.upper_level.I),
+                    float(self.upper_level.F),
+                    float(self.lower_level.F),
+                )
+                upper_index = self.upper_level.m + self.upper_level.F
+                lower_index = self.lower_level.m + self.lower_level.F
+            else:
+                angular_table = get_quadrupole_angular_table(
+                    float(self.upper_level.J), float(self.lower_level.J)
+                )
+                upper_index = self.upper_level.m + self.upper_level.J
+                lower_index = self.lower_level.m + self.lower_level.J
+            # (epsilon x k_hat)^(2) . T^(2) = sum_q (-1)^q [epsilon x k_hat]_{-q} T_q
+            polarization_effect = (
+                (-1) ** q
+                * self.laser.polarization.quadrupole_tensor_in_spherical[2 - q]
+                * angular_table[int(round(upper_index)), int(round(lower_index))]
+            )
+            return coefficient * polarization_effect
         else:
             raise ValueError("Transition order not supported")
 
 
 class Experiment:
     def __init__(self, ion: Ion, magnetic_field: float):
+        """
+        The ion is only read, so one Ion can be shared by experiments at different
+        magnetic fields, including experiments solved concurrently by solve_many.
+        The energies in the magnetic field are held in self.energies; the energy
+        attribute (and the printed energy) of the ion's level objects is the zero field
+        value, or whatever Ion.apply_magnetic_field last set, not this experiment's.
+        Use get_energy to read the energy of a level in this experiment.
+        """
         self.ion = ion
         self.magnetic_field = magnetic_field
         self.levels: List[EnergyLevel] = []
         self.transitions: List[Transition] = []
-        self.ion.apply_magnetic_field(magnetic_field)
+        self.energies = self._get_zeeman_energies()
         self.lasers: List[Laser] = []
 
+    def _get_zeeman_energies(self) -> Dict[EnergyLevel, float]:
+        """Return the energies of the ion levels and their Zeeman sublevels in the magnetic field."""
+        energies = {}
+        for level in self.ion.energy_levels:
+            energies[level] = level.energy
+            for zeeman_level in level.zeeman_levels:
+                energies[zeeman_level] = (
+                    level.energy
+                    + zeeman_level.zeeman_splitting_func(self.magnetic_field)
+                )
+        return energies
+
+    def get_energy(self, level: EnergyLevel) -> float:
+        """Return the energy of level in this experiment's magnetic field."""
+        return self.energies.get(level, level.energy)
+
     def add_levels(self, levels: List[EnergyLevel]):
         self.levels.extend(levels)
 
@@ -130,7 +272,7 @@ class Experiment:
                 levels.append(t.upper_level)
         return levels
 
-    def get_hamiltonian(self, using_rwa: bool = True):
+    def get_hamiltonian(self, using_rwa: bool = True, t_list: List[float] = None):
         """Construct the system Hamiltonian.
 
         Parameters
@@ -138,22 +280,85 @@ class Experiment:
         using_rwa : bool, optional
             If ``True`` the interaction Hamiltonian is constructed under the
             rotating wave approximation.
+        t_list : list of float, optional
+            Time grid on which the coefficients of shaped lasers are sampled.
+            Required if any laser has an amplitude, phase or frequency
+            envelope. The grid must resolve the phase evolution of the
+            sampled coefficients (the detuning under the rotating wave
+            approximation, otherwise the envelope phase), else a
+            ``ValueError`` is raised. Sampled coefficients are linearly
+            interpolated between the points of t_list. Without the rotating
+            wave approximation the optical carrier is evaluated analytically
+            as a string coefficient, which qutip compiles if Cython is
+            installed and otherwise evaluates in Python at every step.
         """
         import qutip as qt
 
         levels = self._collect_levels()
         n = len(levels)
-        energies = [lev.energy / Constants.h_bar for lev in levels]
+        energies = [self.get_energy(lev) / Constants.h_bar for lev in levels]
         H0 = qt.Qobj(np.diag(energies))
 
         H = [H0]
 
+        if t_list is not None:
+            t_list = np.asarray(t_list, dtype=float)
+        envelope_samples = {}
+
         for tr in self.transitions:
             i = levels.index(tr.lower_level)
             j = levels.index(tr.upper_level)
             op = qt.basis(n, j) * qt.basis(n, i).dag()
-            if using_rwa:
-                w0 = abs(tr.upper_level.energy - tr.lower_level.energy) / Constants.h
+            if tr.laser.is_shaped():
+                if t_list is None:
+                    raise ValueError(
+                        f"t_list is required for shaped laser {tr.laser.name}"
+                    )
+                if tr.laser not in envelope_samples:
+                    envelope_samples[tr.laser] = tr.laser.sample_envelopes(t_list)
+                amplitude, phase = envelope_samples[tr.laser]
+                # the op.dag() coefficients are the complex conjugates of the op ones
+                # so that H stays hermitian for complex Rabi frequencies
+                Omega = tr.rabi_frequency
+                if using_rwa:
+                    w0 = tr.get_transition_energy() / Constants.h
+                    delta = tr.laser.get_frequency() - w0
+                    sampled_phase = delta * t_list + phase
+                    _check_phase_sampling(sampled_phase, tr.laser.name)
+                    samples_plus = 0.5 * Omega * amplitude * np.exp(-1j * sampled_phase)
+                    samples_minus = (
+                        0.5 * np.conj(Omega) * amplitude * np.exp(1j * sampled_phase)
+                    )
+                    H.append([op, qt.coefficient(samples_plus, tlist=t_list, order=1)])
+                    H.append(
+                        [op.dag(), qt.coefficient(samples_minus, tlist=t_list, order=1)]
+                    )
+                else:
+                    # only the envelope is sampled, the optical carrier is a string
+                    # coefficient that qutip compiles
+                    _check_phase_sampling(phase, tr.laser.name)
+                    wL = tr.laser.get_frequency()
+                    carrier_plus = qt.coefficient("exp(1j*w*t)", args={"w": wL})
+                    carrier_minus = qt.coefficient("exp(-1j*w*t)", args={"w": wL})
+                    for operator, prefactor in ((op, Omega), (op.dag(), np.conj(Omega))):
+                        envelope_plus = 0.5 * prefactor * amplitude * np.exp(1j * phase)
+                        envelope_minus = 0.5 * prefactor * amplitude * np.exp(-1j * phase)
+                        H.append(
+                            [
+                                operator,
+                                qt.coefficient(envelope_plus, tlist=t_list, order=1)
+                                * carrier_plus,
+                            ]
+                        )
+                        H.append(
+                            [
+                                operator,
+                                qt.coefficient(envelope_minus, tlist=t_list, order=1)
+                                * carrier_minus,
+                            ]
+                        )
+            elif using_rwa:
+                w0 = tr.get_transition_energy() / Constants.h
                 delta = tr.laser.get_frequency() - w0
 
                 def f_plus(t, args=None, Omega=tr.rabi_frequency, d=delta):
@@ -179,39 +384,74 @@ class Experiment:
         t_list: List[float],
         using_rwa: bool = True,
         initial_state=None,
+        options: Optional[dict] = None,
     ):
-        """Solve the Schr\u00f6dinger equation for the experiment."""
+        """Solve the Schr\u00f6dinger equation for the experiment.
+
+        ``options`` is passed on to :func:`qutip.sesolve`, e.g.
+        ``{"nsteps": 100000, "atol": 1e-10, "method": "adams"}``.
+        """
         import qutip as qt
 
-        H, levels = self.get_hamiltonian(using_rwa=using_rwa)
+        H, levels = self.get_hamiltonian(using_rwa=using_rwa, t_list=t_list)
         n = len(levels)
         if initial_state is None:
             initial_state = qt.basis(n, 0)
 
         e_ops = [qt.basis(n, i) * qt.basis(n, i).dag() for i in range(n)]
-        result = qt.sesolve(H, initial_state, t_list, e_ops=e_ops)
+        result = qt.sesolve(H, initial_state, t_list, e_ops=e_ops, options=options)
         self._last_levels = levels
         self._last_result = result
         return result
 
-    def plot_populations(self, result=None):
-        """Plot state populations as a function of time."""
-        import matplotlib.pyplot as plt
+    def plot_populations(
+        self,
+        result=None,
+        filename: Optional[str] = None,
+        max_points: Optional[int] = None,
+        ax=None,
+    ):
+        """Plot state populations as a function of time.
+
+        Parameters
+        ----------
+        result : qutip.solver.Result, optional
+            Result to plot. Defaults to the result of the last :meth:`solve`.
+        filename : str, optional
+            If given, the figure is rendered without a display and written to
+            this file. The format (PNG, SVG, ...) follows the extension.
+        max_points : int, optional
+            Decimate each time series to at most this many points.
+        ax : matplotlib.axes.Axes, optional
+            Draw into existing axes instead of creating a new figure.
+        """
+        from matplotlib.collections import LineCollection
 
         if result is None:
             result = getattr(self, "_last_result", None)
             if result is None:
                 return
         levels = getattr(self, "_last_levels", self._collect_levels())
-        times = result.times
-        for i, lev in enumerate(levels):
-            plt.plot(times, result.expect[i], label=lev.name)
-        plt.xlabel("Time (s)")
-        plt.ylabel("Population")
-        plt.legend()
-        plt.tight_layout()
-        plt.show()
-    
+        times = np.asarray(result.times)
+        populations = np.real(np.asarray(result.expect[: len(levels)]))
+        if max_points is not None and len(times) > max_points:
+            idx = _decimation_indices(len(times), max_points)
+            times = times[idx]
+            populations = populations[:, idx]
+
+        show = ax is None
+        fig, ax = _get_axes(ax, filename)
+        colors = _colors(len(levels))
+        segments = np.stack(
+            [np.broadcast_to(times, populations.shape), populations], axis=-1
+        )
+        ax.add_collection(LineCollection(segments, colors=colors))
+        ax.autoscale_view()
+        _add_legend(ax, colors, [lev.name for lev in levels])
+        ax.set_xlabel("Time (s)")
+        ax.set_ylabel("Population")
+        return _finish_figure(fig, filename, show)
+
     def add_laser(
         self, laser: Laser, transition_pair: List[Tuple[EnergyLevel, EnergyLevel]]
     ):
@@ -232,13 +472,18 @@ class Experiment:
                                     level_2_zeeman_level,
                                     laser,
                                     self.magnetic_field,
+                                    self.energies,
                                 )
                             )
                 else:
                     for zeeman_level in level_1.zeeman_levels:
                         self.transitions.append(
                             Transition(
-                                zeeman_level, level_2, laser, self.magnetic_field
+                                zeeman_level,
+                                level_2,
+                                laser,
+                                self.magnetic_field,
+                                self.energies,
                             )
                         )
             else:
@@ -249,77 +494,237 @@ class Experiment:
                     for zeeman_level in level_2.zeeman_levels:
                         self.transitions.append(
                             Transition(
-                                level_1, zeeman_level, laser, self.magnetic_field
+                                level_1,
+                                zeeman_level,
+                                laser,
+                                self.magnetic_field,
+                                self.energies,
                             )
                         )
                 else:  # level_1 is a ZeemanLevel and level_2 is ZeemanLevel
                     self.transitions.append(
-                        Transition(level_1, level_2, laser, self.magnetic_field)
+                        Transition(
+                            level_1, level_2, laser, self.magnetic_field, self.energies
+                        )
                     )
 
-    def plot_transitions(self):
-        """Plot available transitions with their Rabi frequencies."""
-        import matplotlib.pyplot as plt
+    def plot_transitions(
+        self, filename: Optional[str] = None, show_labels: bool = True, ax=None
+    ):
+        """Plot available transitions with their Rabi frequencies.
+
+        Parameters
+        ----------
+        filename : str, optional
+            If given, the figure is rendered without a display and written to
+            this file. The format (PNG, SVG, ...) follows the extension.
+        show_labels : bool, optional
+            Annotate every energy level with its name.
+        ax : matplotlib.axes.Axes, optional
+            Draw into existing axes instead of creating a new figure.
+        """
+        from matplotlib.collections import LineCollection
 
         if not self.transitions:
             return
 
         # gather unique energy levels and corresponding magnetic quantum numbers
         levels = {}
-        m_values = set()
         for t in self.transitions:
             for lev in (t.lower_level, t.upper_level):
-                levels[lev] = lev.energy
-                m_values.add(getattr(lev, "m", 0))
+                levels[lev] = self.get_energy(lev)
 
         # map magnetic quantum number to x coordinate
-        m_list = sorted(m_values)
-        m_to_x = {m: i for i, m in enumerate(m_list)}
-        level_pos = {lev: m_to_x.get(getattr(lev, "m", 0)) for lev in levels}
-        energies_thz = {
-            lev: energy / (Constants.h * Units.THz) for lev, energy in levels.items()
-        }
-
-        # prepare colors for lasers
-        unique_lasers = list(dict.fromkeys([t.laser for t in self.transitions]))
-        colors = plt.cm.tab10(range(len(unique_lasers)))
-        laser_color = {laser: colors[i] for i, laser in enumerate(unique_lasers)}
+        m_of_level = np.array([getattr(lev, "m", 0) for lev in levels])
+        m_list, level_x = np.unique(m_of_level, return_inverse=True)
+        level_index = {lev: i for i, lev in enumerate(levels)}
+        level_y = np.fromiter(levels.values(), dtype=float) / (Constants.h * Units.THz)
 
-        max_rabi = max(
-            abs(t.rabi_frequency) for t in self.transitions if t.rabi_frequency != 0
-        )
-        if max_rabi == 0:
-            max_rabi = 1
+        show = ax is None
+        fig, ax = _get_axes(ax, filename)
 
         # plot energy levels as small horizontal lines instead of points
-        for lev, pos in level_pos.items():
-            energy = energies_thz[lev]
-            plt.hlines(energy, pos - 0.3, pos + 0.3, color="black")
-            plt.text(pos, energy, lev.name, ha="center", va="bottom", fontsize=8)
+        ax.add_collection(
+            LineCollection(
+                np.stack(
+                    [
+                        np.column_stack([level_x - 0.3, level_y]),
+                        np.column_stack([level_x + 0.3, level_y]),
+                    ],
+                    axis=1,
+                ),
+                colors="black",
+            )
+        )
+        if show_labels:
+            for lev, x, y in zip(levels, level_x, level_y):
+                ax.text(x, y, lev.name, ha="center", va="bottom", fontsize=8)
 
-        # plot transitions with line width proportional to rabi frequency
-        for t in self.transitions:
-            if t.rabi_frequency == 0:
-                continue
-            x1 = level_pos[t.lower_level]
-            x2 = level_pos[t.upper_level]
-            y1 = energies_thz[t.lower_level]
-            y2 = energies_thz[t.upper_level]
-            width = 1 + 4 * abs(t.rabi_frequency) / max_rabi
-            plt.plot([x1, x2], [y1, y2], color=laser_color[t.laser], linewidth=width)
+        # plot transitions with line width proportional to rabi frequency,
+        # one collection per laser
+        unique_lasers = list(dict.fromkeys([t.laser for t in self.transitions]))
+        colors = _colors(len(unique_lasers))
+        lower = np.array([level_index[t.lower_level] for t in self.transitions])
+        upper = np.array([level_index[t.upper_level] for t in self.transitions])
+        rabi = np.abs(np.array([t.rabi_frequency for t in self.transitions], dtype=complex))
+        max_rabi = rabi.max() if rabi.max() > 0 else 1
+        laser_of_transition = np.array(
+            [unique_lasers.index(t.laser) for t in self.transitions]
+        )
+        for k in range(len(unique_lasers)):
+            mask = (laser_of_transition == k) & (rabi != 0)
+            segments = np.stack(
+                [
+                    np.column_stack([level_x[lower[mask]], level_y[lower[mask]]]),
+                    np.column_stack([level_x[upper[mask]], level_y[upper[mask]]]),
+                ],
+                axis=1,
+            )
+            ax.add_collection(
+                LineCollection(
+                    segments,
+                    colors=[colors[k]],
+                    linewidths=1 + 4 * rabi[mask] / max_rabi,
+                )
+            )
+        ax.autoscale_view()
 
         # make legend for lasers
-        from matplotlib.lines import Line2D
-
-        legend_elements = [
-            Line2D([0], [0], color=laser_color[l], lw=2, label=l.name)
-            for l in unique_lasers
-        ]
-        plt.legend(handles=legend_elements)
+        _add_legend(ax, colors, [l.name for l in unique_lasers])
 
         # label x axis with m values
-        plt.xticks(range(len(m_list)), [str(m) for m in m_list])
-        plt.xlabel("m")
-        plt.ylabel("Energy (THz)")
-        plt.tight_layout()
+        ax.set_xticks(range(len(m_list)))
+        ax.set_xticklabels([str(m) for m in m_list])
+        ax.set_xlabel("m")
+        ax.set_ylabel("Energy (THz)")
+        return _finish_figure(fig, filename, show)
+
+
+def _check_phase_sampling(phase: np.ndarray, laser_name: str):
+    """Raise if consecutive samples of a coefficient phase advance by more than pi."""
+    if len(phase) > 1 and np.max(np.abs(np.diff(phase))) > np.pi:
+        raise ValueError(
+            f"t_list is too coarse for shaped laser {laser_name}: the coefficient "
+            "phase advances by more than pi between samples"
+        )
+
+
+def solve_many(
+    experiments: List[Experiment],
+    t_list: List[float],
+    using_rwa: bool = True,
+    initial_state=None,
+    max_workers: Optional[int] = None,
+    options: Optional[dict] = None,
+):
+    """Solve independent experiments concurrently on a thread pool.
+
+    Experiments may share the same :class:`Ion`, which is only read, so no
+    level data is duplicated. Only the compiled parts of a solve release the
+    GIL; the ODE right-hand side and the coefficient callbacks of unshaped
+    lasers run in Python, so for small level systems the speedup over
+    solving sequentially is limited. Use ``ion-toolkit run`` (a process
+    pool) for CPU-bound sweeps. ``options`` is passed to every
+    :meth:`Experiment.solve` call.
+
+    Returns
+    -------
+    list
+        The result of :meth:`Experiment.solve` for each experiment, in order.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(
+            executor.map(
+                lambda experiment: experiment.solve(
+                    t_list,
+                    using_rwa=using_rwa,
+                    initial_state=initial_state,
+                    options=options,
+                ),
+                experiments,
+            )
+        )
+
+
+def _get_axes(ax, filename: Optional[str]):
+    """Return (figure, axes). Figures for file export bypass pyplot so no display is needed."""
+    if ax is not None:
+        return ax.figure, ax
+    if filename is not None:
+        from matplotlib.figure import Figure
+
+        fig = Figure()
+        return fig, fig.add_subplot()
+    import matplotlib.pyplot as plt
+
+    return plt.subplots()
+
+
+def _finish_figure(fig, filename: Optional[str], show: bool):
+    if filename is not None:
+        fig.tight_layout()
+        fig.savefig(filename)
+    elif show:
+        import matplotlib.pyplot as plt
+
+        fig.tight_layout()
         plt.show()
+    return fig
+
+
+def _colors(n: int) -> np.ndarray:
+    import matplotlib
+
+    return matplotlib.colormaps["tab10"](np.arange(n) % 10)
+
+
+def _add_legend(ax, colors, labels: List[str]):
+    from matplotlib.lines import Line2D
+
+    ax.legend(
+        handles=[
+            Line2D([0], [0], color=color, lw=2, label=label)
+            for color, label in zip(colors, labels)
+        ]
+    )
+
+
+def _decimation_indices(n: int, max_points: int) -> np.ndarray:
+    """Evenly strided indices into a length n series, always keeping the last point."""
+    idx = np.arange(0, n, int(np.ceil(n / max_points)))
+    if idx[-1] != n - 1:
+        idx = np.append(idx[:-1] if len(idx) >= max_points else idx, n - 1)
+    return idx
+
+
+if __name__ == "__main__":
+    # selection rule check: sigma+ light (k along z, epsilon = (x + iy) / sqrt(2)) drives
+    # m_upper - m_lower = +1 on both the dipole and the quadrupole line, sigma- drives -1
+    ion = Ion("Ba", 138)
+    S_1_2, P_1_2, _, _, D_5_2 = ion.energy_levels
+    for handedness, epsilon_1 in (("sigma+", 1j), ("sigma-", -1j)):
+        polarization = Polarization(
+            np.array([0, 0, 1]), 1 / np.sqrt(2), epsilon_1 / np.sqrt(2)
+        )
+        for upper in (P_1_2, D_5_2):
+            experiment = Experiment(ion, 5e-4)
+            experiment.add_laser(
+                Laser(
+                    handedness,
+                    get_resonant_frequency(S_1_2, upper),
+                    1e6,
+                    0,
+                    polarization,
+                ),
+                [(S_1_2, upper)],
+            )
+            max_rabi = max(abs(t.rabi_frequency) for t in experiment.transitions)
+            delta_m = sorted(
+                {
+                    int(round(t.upper_level.m - t.lower_level.m))
+                    for t in experiment.transitions
+                    if abs(t.rabi_frequency) > 1e-6 * max_rabi
+                }
+            )
+            print(f"{handedness} {S_1_2.name} -> {upper.name}: delta m = {delta_m}")
+            assert delta_m == [1 if handedness == "sigma+" else -1]
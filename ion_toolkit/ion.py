@@ -1,23 +1,42 @@
 import os
-import json
-from typing import List, Dict
+import warnings
+from typing import List, Dict, Optional
 from collections import defaultdict
 import numpy as np
 from .energy_level import EnergyLevel, FineStructure, HyperfineStructure
 from .units import Units, Constants
-from .utils import L_str_to_int
+from .ion_library import LIBRARY_DIR, ORDERS, get_default_store, load_json
 
 
 class Ion:
-    def __init__(self, species: str, mass_number: int):
+    def __init__(self, species: str, mass_number: int, library_name: Optional[str] = None):
+        """
+        Level data is read from the compiled binary store (see ion_library.build_library)
+        when it contains the isotope and its JSON source has not changed since the build,
+        otherwise from the JSON file ion_library/{species}_II/{species}-{mass_number}.json.
+        A user-supplied JSON file can be given with library_name.
+        library holds the loaded data as an ion_library.IonData.
+        """
         self.species = species
         self.mass_number = mass_number
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        self.library_name = os.path.join(
-            current_dir,
-            f"../ion_library/{self.species}_II/{self.species}-{self.mass_number}.json",
+        json_name = library_name or os.path.join(
+            LIBRARY_DIR,
+            f"{self.species}_II/{self.species}-{self.mass_number}.json",
         )
-        self.library = json.load(open(self.library_name))
+        store = get_default_store() if library_name is None else None
+        use_store = store is not None and (species, mass_number) in store
+        if use_store and store.source_changed(species, mass_number, json_name):
+            warnings.warn(
+                f"{json_name} changed since {store.path} was built, loading the JSON file. "
+                "Rebuild the store with python -m ion_toolkit.ion_library."
+            )
+            use_store = False
+        if use_store:
+            self.library_name = store.path
+            self.library = store.get(species, mass_number)
+        else:
+            self.library_name = json_name
+            self.library = load_json(self.library_name)
         self.energy_levels: List[EnergyLevel] = []
         self.branching_ratios: defaultdict[str, defaultdict[str, float]] = defaultdict(
             lambda: defaultdict(float)
@@ -26,48 +45,39 @@ class Ion:
         self._load_energy_levels()
 
     def _load_branching_ratios(self):
-        for branching_ratio in self.library["branching_ratios"]:
-            self.branching_ratios[branching_ratio["upper_level"]][
-                branching_ratio["lower_level"]
-            ] = branching_ratio["branching_ratio"]
+        names = self.library.level_names
+        for upper, lower in zip(*np.nonzero(self.library.branching_matrix)):
+            self.branching_ratios[names[upper]][names[lower]] = float(
+                self.library.branching_matrix[upper, lower]
+            )
 
     def _load_energy_levels(self):
-        for level in self.library["energy_levels"]:
-            if level["order"] == "FineStructure":
+        for name, level in zip(self.library.level_names, self.library.levels):
+            if ORDERS[level["order"]] == "FineStructure":
                 self.energy_levels.append(
                     FineStructure(
-                        str(level["n"]) + level["L"] + str(level["J"]),
-                        level["energy_Hz"] * Constants.h,
-                        level["n"],
-                        self.library["I"],
-                        L_str_to_int(level["L"]),
-                        level["J"],
-                        2 * np.pi * level["line_width_2_pi_Hz"],
-                        self.branching_ratios[
-                            str(level["n"]) + level["L"] + str(level["J"])
-                        ],
+                        name,
+                        float(level["energy_Hz"]) * Constants.h,
+                        int(level["n"]),
+                        self.library.I,
+                        int(level["L"]),
+                        float(level["J"]),
+                        2 * np.pi * float(level["line_width_2_pi_Hz"]),
+                        self.branching_ratios[name],
                     )
                 )
-            elif level["order"] == "HyperfineStructure":
+            elif ORDERS[level["order"]] == "HyperfineStructure":
                 self.energy_levels.append(
                     HyperfineStructure(
-                        str(level["n"])
-                        + level["L"]
-                        + str(level["J"])
-                        + str(level["F"]),
-                        level["energy_Hz"] * Constants.h,
-                        level["n"],
-                        self.library["I"],
-                        L_str_to_int(level["L"]),
-                        level["J"],
-                        level["F"],
-                        2 * np.pi * level["line_width_2_pi_Hz"],
-                        self.branching_ratios[
-                            str(level["n"])
-                            + level["L"]
-                            + str(level["J"])
-                            + str(level["F"])
-                        ],
+                        name,
+                        float(level["energy_Hz"]) * Constants.h,
+                        int(level["n"]),
+                        self.library.I,
+                        int(level["L"]),
+                        float(level["J"]),
+                        float(level["F"]),
+                        2 * np.pi * float(level["line_width_2_pi_Hz"]),
+                        self.branching_ratios[name],
                     )
                 )
 
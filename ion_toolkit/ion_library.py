@@ -0,0 +1,336 @@
+import os
+import json
+import mmap
+import hashlib
+import argparse
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from .utils import L_str_to_int
+
+LIBRARY_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "ion_library"
+)
+STORE_PATH = os.path.join(LIBRARY_DIR, "ion_library.bin")
+
+MAGIC = b"IONLIB01"
+ALIGNMENT = 64
+ORDERS = ["FineStructure", "HyperfineStructure"]
+LEVEL_DTYPE = np.dtype(
+    [
+        ("order", "<u1"),
+        ("n", "<i4"),
+        ("L", "<i4"),
+        ("J", "<f8"),
+        ("F", "<f8"),  # NaN for fine structure levels
+        ("energy_Hz", "<f8"),
+        ("line_width_2_pi_Hz", "<f8"),
+    ]
+)
+
+
+class IonData:
+    def __init__(
+        self,
+        species: str,
+        mass_number: int,
+        I: float,
+        level_names: List[str],
+        levels: np.ndarray,
+        branching_matrix: np.ndarray,
+    ):
+        """
+        Compiled level data of a single isotope.
+        levels is a LEVEL_DTYPE record array and branching_matrix[i, j] is the branching
+        ratio from level_names[i] (upper) to level_names[j] (lower).
+        """
+        self.species = species
+        self.mass_number = mass_number
+        self.I = I
+        self.level_names = level_names
+        self.levels = levels
+        self.branching_matrix = branching_matrix
+
+    def __str__(self):
+        return f"IonData(species={self.species}, mass_number={self.mass_number}, I={self.I}, n_levels={len(self.level_names)})"
+
+    def __repr__(self):
+        return self.__str__()
+
+
+def _level_name(level: dict) -> str:
+    name = str(level["n"]) + level["L"] + str(level["J"])
+    if level["order"] == "HyperfineStructure":
+        name += str(level["F"])
+    return name
+
+
+def _is_half_integer(value) -> bool:
+    return isinstance(value, (int, float)) and value >= 0 and np.isclose(2 * value, round(2 * value))
+
+
+def compile_library(library: dict, source: str = "<library>") -> IonData:
+    """Validate a parsed ion library JSON document and compile it into an IonData."""
+    errors = []
+    for key in ("species", "mass_number", "I", "energy_levels", "branching_ratios"):
+        if key not in library:
+            errors.append(f"missing key '{key}'")
+    if errors:
+        raise ValueError(f"Invalid ion library {source}: " + "; ".join(errors))
+    if not _is_half_integer(library["I"]):
+        errors.append(f"invalid nuclear spin I={library['I']}")
+
+    level_names = []
+    levels = np.zeros(len(library["energy_levels"]), dtype=LEVEL_DTYPE)
+    for i, level in enumerate(library["energy_levels"]):
+        missing = [
+            key
+            for key in ("order", "n", "L", "J", "energy_Hz", "line_width_2_pi_Hz")
+            if key not in level
+        ]
+        if level.get("order") == "HyperfineStructure" and "F" not in level:
+            missing.append("F")
+        if missing:
+            errors.append(f"energy level {i} is missing {', '.join(missing)}")
+            continue
+        if level["order"] not in ORDERS:
+            errors.append(f"energy level {i} has invalid order '{level['order']}'")
+            continue
+        try:
+            L = L_str_to_int(level["L"])
+        except ValueError as e:
+            errors.append(f"energy level {i}: {e}")
+            continue
+        if not _is_half_integer(level["J"]):
+            errors.append(f"energy level {i} has invalid J={level['J']}")
+        if level["order"] == "HyperfineStructure" and not _is_half_integer(level["F"]):
+            errors.append(f"energy level {i} has invalid F={level['F']}")
+        if level["line_width_2_pi_Hz"] < 0:
+            errors.append(f"energy level {i} has negative line width")
+        name = _level_name(level)
+        if name in level_names:
+            errors.append(f"duplicate energy level {name}")
+        level_names.append(name)
+        levels[i] = (
+            ORDERS.index(level["order"]),
+            level["n"],
+            L,
+            level["J"],
+            level["F"] if level["order"] == "HyperfineStructure" else np.nan,
+            level["energy_Hz"],
+            level["line_width_2_pi_Hz"],
+        )
+    if errors:
+        raise ValueError(f"Invalid ion library {source}: " + "; ".join(errors))
+
+    index = {name: i for i, name in enumerate(level_names)}
+    branching_matrix = np.zeros((len(level_names), len(level_names)))
+    for branching_ratio in library["branching_ratios"]:
+        upper = branching_ratio.get("upper_level")
+        lower = branching_ratio.get("lower_level")
+        if upper not in index or lower not in index:
+            errors.append(f"branching ratio {upper} -> {lower} refers to unknown level")
+            continue
+        if not 0 <= branching_ratio.get("branching_ratio", -1) <= 1:
+            errors.append(f"branching ratio {upper} -> {lower} is not in [0, 1]")
+            continue
+        branching_matrix[index[upper], index[lower]] = branching_ratio["branching_ratio"]
+    for name, total in zip(level_names, branching_matrix.sum(axis=1)):
+        if total > 1 + 1e-6:
+            errors.append(f"branching ratios of {name} sum to {total} > 1")
+    if errors:
+        raise ValueError(f"Invalid ion library {source}: " + "; ".join(errors))
+
+    return IonData(
+        library["species"],
+        library["mass_number"],
+        library["I"],
+        level_names,
+        levels,
+        branching_matrix,
+    )
+
+
+def load_json(path: str) -> IonData:
+    with open(path) as f:
+        try:
+            library = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid ion library {path}: {e}") from e
+    return compile_library(library, path)
+
+
+def _source_info(path: str) -> dict:
+    """Identify the contents of a library file, used to detect edits after a build."""
+    stat = os.stat(path)
+    with open(path, "rb") as f:
+        sha1 = hashlib.sha1(f.read()).hexdigest()
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha1": sha1}
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def build_library(
+    library_dir: str = LIBRARY_DIR,
+    output_path: str = STORE_PATH,
+    skip_invalid: bool = False,
+) -> List[str]:
+    """
+    Compile every {species}_II/{species}-{mass}.json file under library_dir into a single
+    binary store at output_path and return the keys of the compiled isotopes.
+
+    The store starts with MAGIC, the header length as a little endian uint64 and a JSON
+    header indexing every isotope together with the mtime, size and SHA-1 of its JSON
+    source. Level and branching arrays follow, each aligned to ALIGNMENT bytes so they
+    can be memory mapped without copying.
+    """
+    compiled: List[Tuple[IonData, dict]] = []
+    errors = []
+    for directory in sorted(os.listdir(library_dir)):
+        if not directory.endswith("_II"):
+            continue
+        for filename in sorted(os.listdir(os.path.join(library_dir, directory))):
+            if not filename.endswith(".json"):
+                continue
+            path = os.path.join(library_dir, directory, filename)
+            try:
+                compiled.append((load_json(path), _source_info(path)))
+            except ValueError as e:
+                errors.append(str(e))
+    if errors and not skip_invalid:
+        raise ValueError("\n".join(errors))
+
+    blocks: List[Tuple[int, np.ndarray]] = []
+    index: Dict[str, dict] = {}
+    offset = 0
+    for data, source in compiled:
+        entry = {
+            "species": data.species,
+            "mass_number": data.mass_number,
+            "I": data.I,
+            "level_names": data.level_names,
+            "source": source,
+        }
+        for key, array in (
+            ("levels", data.levels),
+            ("branching_matrix", data.branching_matrix.astype("<f8")),
+        ):
+            offset = _align(offset)
+            entry[key] = {"offset": offset, "shape": list(array.shape)}
+            blocks.append((offset, array))
+            offset += array.nbytes
+        index[f"{data.species}-{data.mass_number}"] = entry
+
+    header = json.dumps({"version": 2, "isotopes": index}).encode()
+    data_start = _align(len(MAGIC) + 8 + len(header))
+    with open(output_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(np.uint64(len(header)).tobytes())
+        f.write(header)
+        for block_offset, array in blocks:
+            f.seek(data_start + block_offset)
+            f.write(np.ascontiguousarray(array).tobytes())
+    return list(index)
+
+
+class IonLibraryStore:
+    def __init__(self, path: str = STORE_PATH):
+        """Read-only view of a binary store written by build_library."""
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not an ion library store")
+        header_length = int(
+            np.frombuffer(self._mmap, dtype="<u8", count=1, offset=len(MAGIC))[0]
+        )
+        header_start = len(MAGIC) + 8
+        header = json.loads(self._mmap[header_start : header_start + header_length])
+        self._index: Dict[str, dict] = header["isotopes"]
+        self._data_start = _align(header_start + header_length)
+        self._cache: Dict[str, IonData] = {}
+
+    def isotopes(self) -> List[Tuple[str, int]]:
+        return [(entry["species"], entry["mass_number"]) for entry in self._index.values()]
+
+    def __contains__(self, key: Tuple[str, int]) -> bool:
+        species, mass_number = key
+        return f"{species}-{mass_number}" in self._index
+
+    def source_changed(self, species: str, mass_number: int, path: str) -> bool:
+        """
+        Return True if the JSON file at path no longer matches the file the isotope was
+        compiled from. The SHA-1 is only computed when the mtime or size differ.
+        """
+        if not os.path.exists(path):
+            return False
+        source = self._index[f"{species}-{mass_number}"].get("source")
+        if source is None:
+            return True
+        stat = os.stat(path)
+        if stat.st_mtime_ns == source["mtime_ns"] and stat.st_size == source["size"]:
+            return False
+        return _source_info(path)["sha1"] != source["sha1"]
+
+    def _array(self, block: dict, dtype) -> np.ndarray:
+        dtype = np.dtype(dtype)
+        count = int(np.prod(block["shape"]))
+        return np.frombuffer(
+            self._mmap,
+            dtype=dtype,
+            count=count,
+            offset=self._data_start + block["offset"],
+        ).reshape(block["shape"])
+
+    def get(self, species: str, mass_number: int) -> IonData:
+        key = f"{species}-{mass_number}"
+        if key not in self._cache:
+            if key not in self._index:
+                raise KeyError(f"{key} is not in {self.path}")
+            entry = self._index[key]
+            self._cache[key] = IonData(
+                entry["species"],
+                entry["mass_number"],
+                entry["I"],
+                entry["level_names"],
+                self._array(entry["levels"], LEVEL_DTYPE),
+                self._array(entry["branching_matrix"], "<f8"),
+            )
+        return self._cache[key]
+
+
+_default_store: Optional[IonLibraryStore] = None
+
+
+def get_default_store() -> Optional[IonLibraryStore]:
+    """Return the store at STORE_PATH, or None if it has not been built."""
+    global _default_store
+    if _default_store is None and os.path.exists(STORE_PATH):
+        _default_store = IonLibraryStore(STORE_PATH)
+    return _default_store
+
+
+def available_isotopes() -> List[Tuple[str, int]]:
+    store = get_default_store()
+    if store is None:
+        raise FileNotFoundError(
+            f"{STORE_PATH} not found, run python -m ion_toolkit.ion_library first"
+        )
+    return store.isotopes()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compile the ion_library JSON files into a binary store."
+    )
+    parser.add_argument("--library-dir", default=LIBRARY_DIR)
+    parser.add_argument("--output", default=STORE_PATH)
+    parser.add_argument(
+        "--skip-invalid",
+        action="store_true",
+        help="skip library files that fail validation instead of aborting",
+    )
+    args = parser.parse_args()
+    for key in build_library(args.library_dir, args.output, args.skip_invalid):
+        print(key)
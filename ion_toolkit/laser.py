@@ -1,3 +1,4 @@
+from typing import Optional, Tuple
 from .units import Constants
 import numpy as np
 
@@ -37,6 +38,78 @@ class Polarization:
                 / np.sqrt(2),
             ]
         )  # in order of q = -1, q = 0, q = 1
+        k_hat_in_spherical_tensor = np.array(
+            [
+                (self.k_hat[0] - 1j * self.k_hat[1]) / np.sqrt(2),
+                self.k_hat[2],
+                -(self.k_hat[0] + 1j * self.k_hat[1]) / np.sqrt(2),
+            ]
+        )
+        # rank 2 part of epsilon x k_hat, which couples quadrupole transitions
+        e_m, e_0, e_p = self.epsilon_in_spherical_tensor
+        k_m, k_0, k_p = k_hat_in_spherical_tensor
+        self.quadrupole_tensor_in_spherical = np.array(
+            [
+                e_m * k_m,
+                (e_m * k_0 + e_0 * k_m) / np.sqrt(2),
+                (e_p * k_m + 2 * e_0 * k_0 + e_m * k_p) / np.sqrt(6),
+                (e_p * k_0 + e_0 * k_p) / np.sqrt(2),
+                e_p * k_p,
+            ]
+        )  # in order of q = -2, q = -1, q = 0, q = 1, q = 2
+
+
+class Envelope:
+    def __init__(self, times: np.ndarray, values: np.ndarray):
+        """
+        Sampled time dependence of a laser parameter.
+        times is a strictly increasing array of sample times in seconds and values holds the
+        envelope at those times. Between samples the envelope is linearly interpolated and
+        outside of the sampled window it is held at the first / last value.
+        """
+        self.times = np.asarray(times, dtype=float)
+        self.values = np.asarray(values, dtype=float)
+        if self.times.ndim != 1 or self.times.shape != self.values.shape:
+            raise ValueError("Envelope times and values must be 1D arrays of equal length")
+        if self.times.size < 2 or np.any(np.diff(self.times) <= 0):
+            raise ValueError("Envelope times must be strictly increasing with at least 2 samples")
+
+    def __call__(self, t: np.ndarray) -> np.ndarray:
+        return np.interp(t, self.times, self.values)
+
+    @classmethod
+    def gaussian(
+        cls, times: np.ndarray, center: float, sigma: float, peak: float = 1.0
+    ) -> "Envelope":
+        times = np.asarray(times, dtype=float)
+        return cls(times, peak * np.exp(-((times - center) ** 2) / (2 * sigma**2)))
+
+    @classmethod
+    def blackman(
+        cls, times: np.ndarray, start: float, duration: float, peak: float = 1.0
+    ) -> "Envelope":
+        times = np.asarray(times, dtype=float)
+        x = np.clip((times - start) / duration, 0, 1)
+        values = 0.42 - 0.5 * np.cos(2 * np.pi * x) + 0.08 * np.cos(4 * np.pi * x)
+        values[(times < start) | (times > start + duration)] = 0
+        return cls(times, peak * values)
+
+    @classmethod
+    def linear_chirp(
+        cls,
+        times: np.ndarray,
+        start: float,
+        duration: float,
+        frequency_start: float,
+        frequency_end: float,
+    ) -> "Envelope":
+        """
+        Frequency offset sweeping linearly from frequency_start to frequency_end over
+        [start, start + duration]. Intended to be used as a frequency envelope.
+        """
+        times = np.asarray(times, dtype=float)
+        x = np.clip((times - start) / duration, 0, 1)
+        return cls(times, frequency_start + (frequency_end - frequency_start) * x)
 
 
 class Laser:
@@ -47,7 +120,16 @@ class Laser:
         intensity: float,
         line_width: float,
         polarization: Polarization,
+        amplitude_envelope: Optional[Envelope] = None,
+        phase_envelope: Optional[Envelope] = None,
+        frequency_envelope: Optional[Envelope] = None,
     ):
+        """
+        amplitude_envelope scales the electric field amplitude (dimensionless).
+        phase_envelope is an additional optical phase in radians.
+        frequency_envelope is an offset from frequency in Hz, e.g. Envelope.linear_chirp.
+        Envelopes may also be given as (times, values) tuples.
+        """
         self.name = name
         self.frequency = frequency
         self.wavelength = Constants.c / frequency
@@ -55,6 +137,42 @@ class Laser:
         self.line_width = line_width
         self.polarization = polarization
         self.k_hat = polarization.k_hat
+        self.amplitude_envelope = self._to_envelope(amplitude_envelope)
+        self.phase_envelope = self._to_envelope(phase_envelope)
+        self.frequency_envelope = self._to_envelope(frequency_envelope)
+
+    @staticmethod
+    def _to_envelope(envelope) -> Optional[Envelope]:
+        if envelope is None or isinstance(envelope, Envelope):
+            return envelope
+        times, values = envelope
+        return Envelope(times, values)
+
+    def is_shaped(self) -> bool:
+        return (
+            self.amplitude_envelope is not None
+            or self.phase_envelope is not None
+            or self.frequency_envelope is not None
+        )
+
+    def sample_envelopes(self, t_list: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the amplitude factor and the additional phase of the laser on t_list.
+        The phase includes the accumulated phase of the frequency envelope.
+        """
+        t_list = np.asarray(t_list, dtype=float)
+        amplitude = np.ones_like(t_list)
+        phase = np.zeros_like(t_list)
+        if self.amplitude_envelope is not None:
+            amplitude = self.amplitude_envelope(t_list)
+        if self.phase_envelope is not None:
+            phase = phase + self.phase_envelope(t_list)
+        if self.frequency_envelope is not None:
+            frequency_offset = self.frequency_envelope(t_list)
+            phase = phase + np.concatenate(
+                ([0.0], np.cumsum(0.5 * (frequency_offset[1:] + frequency_offset[:-1]) * np.diff(t_list)))
+            )
+        return amplitude, phase
 
     def get_frequency(self):
         return Constants.c / self.wavelength
@@ -0,0 +1,267 @@
+"""
+Batch runner for experiments described by a JSON manifest, e.g.
+
+{
+    "output_dir": "results",
+    "workers": 4,
+    "ion": {"species": "Ba", "mass_number": 138},
+    "magnetic_field": 5e-4,
+    "lasers": [
+        {
+            "name": "493",
+            "resonance": ["6S0.5", "6P0.5"],
+            "detuning": 0.0,
+            "intensity": 1e-3,
+            "line_width": 0.0,
+            "polarization": {"k_hat": [1, 0, 0], "epsilon_0": 1, "epsilon_1": 0},
+            "amplitude_envelope": {"shape": "gaussian", "center": 5e-10, "sigma": 1e-10},
+            "transitions": [["6S0.5", "6P0.5"]]
+        }
+    ],
+    "solver": {
+        "t_start": 0.0,
+        "t_stop": 1e-9,
+        "n_steps": 1001,
+        "using_rwa": true,
+        "options": {"nsteps": 10000000}
+    },
+    "grid": {"magnetic_field": [1e-4, 5e-4], "lasers.0.detuning": [-1e6, 0, 1e6]}
+}
+
+Every combination of the "grid" values is a job. Grid keys are dot separated paths into
+the manifest, with integers indexing lists. A laser is tuned either with "frequency" in
+Hz or with "resonance" (a pair of level names) plus "detuning" in Hz. Complex
+polarization components may be written as [real, imag]. Envelopes are sampled on the
+solver time grid and take the keyword arguments of the matching Envelope preset.
+Solver "options" are passed to qutip.sesolve (nsteps, atol, rtol, method, ...); the
+level energies make the equations stiff, so long time windows need a large nsteps.
+"""
+
+import os
+import copy
+import json
+import hashlib
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from .experiment import Experiment
+from .ion import Ion
+from .laser import Envelope, Laser, Polarization
+from .utils import get_resonant_frequency
+
+ENVELOPE_SHAPES = {
+    "gaussian": Envelope.gaussian,
+    "blackman": Envelope.blackman,
+    "linear_chirp": Envelope.linear_chirp,
+}
+
+
+def load_manifest(path: str) -> dict:
+    with open(path) as f:
+        manifest = json.load(f)
+    for key in ("ion", "lasers", "solver"):
+        if key not in manifest:
+            raise ValueError(f"Manifest {path} is missing key '{key}'")
+    manifest.setdefault("magnetic_field", 0.0)
+    manifest.setdefault("grid", {})
+    manifest.setdefault(
+        "output_dir", os.path.splitext(os.path.abspath(path))[0] + "_results"
+    )
+    return manifest
+
+
+def _set_path(job: dict, path: str, value):
+    keys = [int(key) if key.isdigit() else key for key in path.split(".")]
+    target = job
+    for key in keys[:-1]:
+        target = target[key]
+    target[keys[-1]] = value
+
+
+def expand_jobs(manifest: dict) -> List[dict]:
+    """
+    Expand the parameter grid of a manifest into one job per distinct grid point.
+    Grid points resolving to the same job id are only kept once.
+    """
+    base = {key: manifest[key] for key in ("ion", "magnetic_field", "lasers", "solver")}
+    grid = manifest.get("grid", {})
+    jobs = {}
+    for values in itertools.product(*grid.values()):
+        job = copy.deepcopy(base)
+        for path, value in zip(grid.keys(), values):
+            _set_path(job, path, value)
+        job["parameters"] = dict(zip(grid.keys(), values))
+        job["id"] = job_id(job)
+        jobs.setdefault(job["id"], job)
+    return list(jobs.values())
+
+
+def _normalize_numbers(value):
+    """Cast ints to floats so that e.g. 0 and 0.0 give the same job id."""
+    if isinstance(value, dict):
+        return {key: _normalize_numbers(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_normalize_numbers(item) for item in value]
+    if isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+
+def job_id(job: dict) -> str:
+    """Stable identifier of a job, independent of its position in the grid."""
+    content = {key: job[key] for key in ("ion", "magnetic_field", "lasers", "solver")}
+    content = _normalize_numbers(content)
+    return hashlib.sha1(json.dumps(content, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def _to_complex(value) -> complex:
+    if isinstance(value, (list, tuple)):
+        return complex(value[0], value[1])
+    return complex(value)
+
+
+def _find_level(ion: Ion, name: str):
+    for level in ion.energy_levels:
+        if level.name == name:
+            return level
+    raise ValueError(f"{ion.species}-{ion.mass_number} has no level {name}")
+
+
+def build_experiment(job: dict) -> Experiment:
+    ion = Ion(
+        job["ion"]["species"],
+        job["ion"]["mass_number"],
+        job["ion"].get("library_name"),
+    )
+    experiment = Experiment(ion, job["magnetic_field"])
+    t_list = get_t_list(job["solver"])
+    for spec in job["lasers"]:
+        if "frequency" in spec:
+            frequency = spec["frequency"]
+        else:
+            level_1, level_2 = (_find_level(ion, name) for name in spec["resonance"])
+            frequency = get_resonant_frequency(level_1, level_2) + spec.get(
+                "detuning", 0.0
+            )
+        polarization = Polarization(
+            np.array(spec["polarization"]["k_hat"], dtype=float),
+            _to_complex(spec["polarization"]["epsilon_0"]),
+            _to_complex(spec["polarization"]["epsilon_1"]),
+        )
+        envelopes = {}
+        for key in ("amplitude_envelope", "phase_envelope", "frequency_envelope"):
+            if key in spec:
+                kwargs = dict(spec[key])
+                envelopes[key] = ENVELOPE_SHAPES[kwargs.pop("shape")](t_list, **kwargs)
+        laser = Laser(
+            spec["name"],
+            frequency,
+            spec["intensity"],
+            spec.get("line_width", 0.0),
+            polarization,
+            **envelopes,
+        )
+        experiment.add_laser(
+            laser,
+            [
+                (_find_level(ion, name_1), _find_level(ion, name_2))
+                for name_1, name_2 in spec["transitions"]
+            ],
+        )
+    return experiment
+
+
+def get_t_list(solver: dict) -> np.ndarray:
+    return np.linspace(solver["t_start"], solver["t_stop"], solver["n_steps"])
+
+
+def _checkpoint_path(output_dir: str, job: dict) -> str:
+    return os.path.join(output_dir, f"{job['id']}.npz")
+
+
+def run_job(job: dict, output_dir: str) -> str:
+    """Solve a single job and checkpoint its populations to output_dir."""
+    experiment = build_experiment(job)
+    t_list = get_t_list(job["solver"])
+    result = experiment.solve(
+        t_list,
+        using_rwa=job["solver"].get("using_rwa", True),
+        options=job["solver"].get("options"),
+    )
+    path = _checkpoint_path(output_dir, job)
+    # write to a temporary file first so an interrupted job never looks finished
+    tmp_path = path + ".tmp.npz"
+    np.savez(
+        tmp_path,
+        times=np.asarray(result.times),
+        populations=np.real(np.asarray(result.expect)),
+        level_names=np.array([level.name for level in experiment._last_levels]),
+        job=json.dumps(job),
+    )
+    os.replace(tmp_path, path)
+    return path
+
+
+def run_manifest(
+    manifest: dict, workers: Optional[int] = None, output_dir: Optional[str] = None
+) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """
+    Run every unfinished job of a manifest. Return the checkpoint path of each finished
+    job id and the error of each failed job id.
+    """
+    output_dir = output_dir or manifest["output_dir"]
+    workers = workers or manifest.get("workers")
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = expand_jobs(manifest)
+    with open(os.path.join(output_dir, "jobs.json"), "w") as f:
+        json.dump(
+            [{"id": job["id"], "parameters": job["parameters"]} for job in jobs],
+            f,
+            indent=4,
+        )
+
+    paths = {}
+    failed = {}
+    pending = []
+    for job in jobs:
+        path = _checkpoint_path(output_dir, job)
+        if os.path.exists(path):
+            paths[job["id"]] = path
+        else:
+            pending.append(job)
+    print(f"{len(jobs)} jobs, {len(paths)} already finished, {len(pending)} to run")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_job, job, output_dir): job for job in pending}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                paths[job["id"]] = future.result()
+            except Exception as e:
+                failed[job["id"]] = repr(e)
+                print(f"failed {job['id']} {job['parameters']}: {e!r}")
+                continue
+            print(f"finished {job['id']} {job['parameters']}")
+    return paths, failed
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="ion-toolkit")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser("run", help="run the jobs of a manifest")
+    run_parser.add_argument("manifest")
+    run_parser.add_argument("--workers", type=int, default=None)
+    run_parser.add_argument("--output-dir", default=None)
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        manifest = load_manifest(args.manifest)
+        _, failed = run_manifest(manifest, args.workers, args.output_dir)
+        if failed:
+            raise SystemExit(f"{len(failed)} jobs failed")
+
+
+if __name__ == "__main__":
+    main()
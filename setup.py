@@ -8,4 +8,7 @@ setup(
     author_email="gyeonghun.kim@duke.edu",
     packages=["ion_toolkit"],  # same as name
     install_requires=[],
+    entry_points={
+        "console_scripts": ["ion-toolkit=ion_toolkit.runner:main"],
+    },
 )